@@ -1,14 +1,30 @@
 import asyncio
 import aiohttp
-from typing import List, Dict, Tuple
-from urllib.parse import urlparse
+from collections import defaultdict
+from typing import DefaultDict, List, Dict, Set, Tuple, Optional
+from urllib.parse import urljoin, urlparse
 import logging
 from tqdm import tqdm
 import time
-from celery import Celery
+from celery import Celery, chord
+from celery.signals import worker_process_init, worker_process_shutdown
 import os
-from bs4 import BeautifulSoup
-import json
+import socket
+import uuid
+from selectolax.parser import HTMLParser
+from pybloom_live import ScalableBloomFilter
+import aiofiles
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # e.g. on Windows, fall back to the default event loop
+    uvloop = None
+
+try:
+    import aiodns
+except ImportError:  # aiohttp.AsyncResolver needs it; fall back to getaddrinfo
+    aiodns = None
 
 from utils.adaptive_rate_limiter import AdaptiveRateLimiter
 from utils.content_extractor import ContentExtractor
@@ -17,7 +33,9 @@ from utils.robots_parser import RobotsParser
 from utils.proxy_manager import ProxyManager
 from utils.content_deduplicator import ContentDeduplicator
 from utils.continuous_learner import ContinuousLearner
-from utils.link_prioritzer import EnhancedLinkPrioritizer
+from utils.link_prioritzer import DEFAULT_ONNX_FILE, EnhancedLinkPrioritizer
+from utils.redis_frontier import RedisFrontier
+from utils.domain_frontier import DomainFrontier
 
 # Celery configuration
 celery_app = Celery(
@@ -28,6 +46,99 @@ celery_app.conf.result_backend = os.environ.get(
     "CELERY_RESULT_BACKEND", "redis://localhost:6379"
 )
 
+DEFAULT_USER_AGENT = "EnhancedCrawlerBot/1.0"
+FRONTIER_REDIS_URL = os.environ.get("FRONTIER_REDIS_URL", "redis://localhost:6379")
+# Seeds pop before any discovered link of the same domain
+SEED_PRIORITY = float("inf")
+RETRY_PRIORITY = 0.0
+
+# Per-worker-process event loop and session, reused across Celery tasks
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker_session: Optional[aiohttp.ClientSession] = None
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    return uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+
+
+def run_event_loop(coro):
+    # Program entry point for coroutines: runs them on uvloop when it is installed
+    if uvloop is not None:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
+
+
+# Must be called from within a running event loop
+def create_session(
+    user_agent: str = DEFAULT_USER_AGENT,
+    verify_ssl: bool = True,
+    nameservers: Optional[List[str]] = None,
+    family: int = socket.AF_UNSPEC,
+) -> aiohttp.ClientSession:
+    # Certificate verification stays on unless the caller explicitly opts out
+    ssl_kwargs = {} if verify_ssl else {"ssl": False}
+    # Resolve with c-ares (aiodns) when installed, through the system's resolvers
+    # unless nameservers are given, and cache each host's addresses for ten minutes
+    if aiodns is not None:
+        resolver = aiohttp.AsyncResolver(nameservers=nameservers)
+    else:
+        if nameservers:
+            logging.getLogger(__name__).warning(
+                "aiodns is not installed; ignoring nameservers and using getaddrinfo"
+            )
+        resolver = aiohttp.ThreadedResolver()
+    connector = aiohttp.TCPConnector(
+        limit=1000,
+        limit_per_host=8,
+        ttl_dns_cache=600,
+        use_dns_cache=True,
+        resolver=resolver,
+        family=family,
+        **ssl_kwargs,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        # aiohttp's default Accept-Encoding already advertises br when a Brotli
+        # decoder is installed, so only compressions it can decode are requested
+        headers={"User-Agent": user_agent},
+        timeout=aiohttp.ClientTimeout(total=30),
+    )
+
+
+async def _open_session(user_agent: str = DEFAULT_USER_AGENT) -> aiohttp.ClientSession:
+    return create_session(user_agent)
+
+
+@worker_process_init.connect
+def init_worker_session(**kwargs):
+    global _worker_loop, _worker_session
+    _worker_loop = new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _worker_session = _worker_loop.run_until_complete(_open_session())
+
+
+@worker_process_shutdown.connect
+def close_worker_session(**kwargs):
+    global _worker_loop, _worker_session
+    if _worker_session is not None:
+        _worker_loop.run_until_complete(_worker_session.close())
+        _worker_session = None
+    if _worker_loop is not None:
+        _worker_loop.close()
+        _worker_loop = None
+
+
+def create_frontier(config: Dict) -> RedisFrontier:
+    # A distributed run keeps its keys under "<frontier_prefix>:<frontier_run_id>"
+    prefix = config.get("frontier_prefix", "crawler")
+    run_id = config.get("frontier_run_id")
+    return RedisFrontier(
+        config.get("redis_url", FRONTIER_REDIS_URL),
+        prefix=f"{prefix}:{run_id}" if run_id else prefix,
+        capacity=config.get("frontier_capacity", 1_000_000),
+        ttl=config.get("frontier_ttl", 86_400),
+    )
+
 
 class EnhancedCrawler:
     def __init__(
@@ -36,8 +147,9 @@ class EnhancedCrawler:
         config: Dict,
         max_depth: int = 3,
         max_urls_per_domain: int = 100,
-        user_agent: str = "EnhancedCrawlerBot/1.0",
-        output_file: str = "crawl_results.json",
+        user_agent: str = DEFAULT_USER_AGENT,
+        output_file: str = "crawl_results.jsonl",
+        session: Optional[aiohttp.ClientSession] = None,
     ):
         self.seed_urls = seed_urls
         self.config = config
@@ -46,6 +158,10 @@ class EnhancedCrawler:
         self.user_agent = user_agent
         self.output_file = output_file
 
+        # A session passed in by the caller is shared and never closed here
+        self._session: Optional[aiohttp.ClientSession] = session
+        self._owns_session = session is None
+
         self.rate_limiter = AdaptiveRateLimiter()
         self.content_extractor = ContentExtractor()
         self.sitemap_parser = SitemapParser()
@@ -58,136 +174,378 @@ class EnhancedCrawler:
             config["keyword_weights"],
             config["content_type_weights"],
             config["target_keywords"],
+            cache_size=config.get("embedding_cache_size", 50_000),
+            cache_dir=config.get("embedding_cache_dir"),
+            hyperscan_min_keywords=config.get("hyperscan_min_keywords", 1000),
+            onnx_file_name=config.get("sentence_onnx_file", DEFAULT_ONNX_FILE),
         )
 
-        self.visited_urls: set = set()
-        self.url_queue: List[Tuple[str, int]] = [(url, 0) for url in seed_urls]
-        self.results: List[Dict] = []
+        # Visited URLs sharded by domain, behind a Bloom filter that answers most misses
+        self.visited_by_domain: DefaultDict[str, Set[str]] = defaultdict(set)
+        self.visited_bloom = ScalableBloomFilter(
+            initial_capacity=100_000, error_rate=1e-4
+        )
+        self.url_queue = DomainFrontier(config.get("max_queue_size", 0))
+        for url in seed_urls:
+            self.url_queue.push(url, 0, SEED_PRIORITY)
+        self.host_semaphores: DefaultDict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(config.get("per_host_concurrency", 8))
+        )
+        # Extracted pages are streamed here as JSON lines while crawling
+        self._out = None
+        self._out_lock = asyncio.Lock()
+        # Requeue attempts of throttled URLs
+        self.retries: Dict[str, int] = {}
+        # Set while crawling from the shared Redis frontier instead of url_queue
+        self.frontier: Optional[RedisFrontier] = None
 
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
 
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = create_session(
+                self.user_agent,
+                verify_ssl=self.config.get("verify_ssl", True),
+                nameservers=self.config.get("dns_nameservers"),
+                # IPv4-only skips AAAA lookups, but cannot reach IPv6-only hosts
+                family=(
+                    socket.AF_INET if self.config.get("ipv4_only") else socket.AF_UNSPEC
+                ),
+            )
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+        await self._close_output()
+
+    def _host_sem(self, domain: str) -> asyncio.Semaphore:
+        return self.host_semaphores[domain]
+
+    async def _worker(self, session: aiohttp.ClientSession):
+        while True:
+            url, depth = await self.url_queue.get()
+            try:
+                await self.process_url(session, url, depth)
+            finally:
+                self.url_queue.task_done()
+
+    def _create_frontier(self) -> RedisFrontier:
+        return create_frontier(self.config)
+
+    async def _enqueue(self, url: str, depth: int, priority: float):
+        if self.frontier is not None:
+            await self.frontier.push(url, depth, priority)
+        else:
+            self.url_queue.push(url, depth, priority)
+
+    async def _retry(self, url: str, depth: int):
+        # The frontier already marked the URL seen, so push() would drop it
+        attempts = self.retries.pop(url, 0) + 1
+        if attempts > self.config.get("max_retries", 3):
+            self.logger.warning(f"Giving up on {url} after {attempts - 1} retries")
+            return
+        self.retries[url] = attempts
+        # Lowest priority: fresh links of the same domain go first
+        if self.frontier is not None:
+            await self.frontier.requeue(url, depth, RETRY_PRIORITY)
+        else:
+            self.url_queue.requeue(url, depth, RETRY_PRIORITY)
+
+    async def _frontier_worker(self, session: aiohttp.ClientSession):
+        idle_timeout = self.config.get("frontier_idle_timeout", 30.0)
+        poll_interval = self.config.get("frontier_poll_interval", 1.0)
+        idle_since = None
+        while True:
+            try:
+                # BZPOPMIN blocks server-side, so idle workers do not poll Redis
+                item = await self.frontier.pop(timeout=poll_interval)
+            except Exception as e:
+                # Count an unreachable Redis as idle time so workers stop eventually
+                self.logger.error(f"Error popping from the frontier: {str(e)}")
+                await asyncio.sleep(poll_interval)
+                item = None
+            if item is None:
+                # Other workers may still push links; stop only after a quiet period
+                now = time.monotonic()
+                idle_since = idle_since or now
+                if now - idle_since >= idle_timeout:
+                    return
+                continue
+
+            idle_since = None
+            url, depth = item
+            try:
+                await self.process_url(session, url, depth)
+            except Exception as e:
+                self.logger.error(f"Error processing {url}: {str(e)}")
+
+    async def seed_frontier(self, config: Optional[Dict] = None):
+        frontier = create_frontier(config or self.config)
+        try:
+            for url in self.seed_urls:
+                await frontier.push(url, 0, SEED_PRIORITY)
+        finally:
+            await frontier.close()
+
+    async def _warm_up(self, session: aiohttp.ClientSession):
+        # Drop dead proxies before crawling. Fetching each seed domain's robots.txt
+        # also resolves and caches its DNS entry, so workers never race on a hostname
+        await asyncio.gather(
+            self.proxy_manager.update_proxies(session),
+            *(
+                self.robots_parser.can_fetch(session, url, self.user_agent)
+                for url in self.seed_urls
+            ),
+            return_exceptions=True,
+        )
+
+    async def crawl_frontier(self):
+        session = await self._get_session()
+        await self._warm_up(session)
+        self.frontier = self._create_frontier()
+        workers = [
+            asyncio.create_task(self._frontier_worker(session))
+            for _ in range(self.config.get("concurrency", 300))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # gather() does not cancel the other workers when one fails; stop them
+            # before the frontier closes, or they would outlive this task on the
+            # worker process's shared event loop
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self.frontier.close()
+            self.frontier = None
+
     async def crawl(self):
-        async with aiohttp.ClientSession(
-            headers={"User-Agent": self.user_agent}
-        ) as session:
-            tasks = [
-                self.process_url(session, url, depth) for url, depth in self.url_queue
-            ]
-            await asyncio.gather(*tasks)
+        session = await self._get_session()
+        await self._warm_up(session)
+        workers = [
+            asyncio.create_task(self._worker(session))
+            for _ in range(self.config.get("concurrency", 300))
+        ]
+        try:
+            await self.url_queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    @property
+    def visited_count(self) -> int:
+        return sum(len(urls) for urls in self.visited_by_domain.values())
 
     async def process_url(self, session: aiohttp.ClientSession, url: str, depth: int):
-        if depth > self.max_depth or url in self.visited_urls:
+        if depth > self.max_depth:
             return
 
         domain = urlparse(url).netloc
-        if (
-            sum(1 for u in self.visited_urls if urlparse(u).netloc == domain)
-            >= self.max_urls_per_domain
-        ):
+        visited = self.visited_by_domain[domain]
+        if url in self.visited_bloom and url in visited:
+            return
+        if len(visited) >= self.max_urls_per_domain:
             return
 
-        if not self.robots_parser.can_fetch(url, self.user_agent):
+        if not await self.robots_parser.can_fetch(session, url, self.user_agent):
             self.logger.info(f"Skipping {url} as per robots.txt rules")
             return
 
-        self.rate_limiter.wait(domain)
+        async with self._host_sem(domain):
+            await self._fetch(session, url, depth, domain)
+
+    async def _fetch(
+        self, session: aiohttp.ClientSession, url: str, depth: int, domain: str
+    ):
+        await self.rate_limiter.wait(domain)
         proxy = self.proxy_manager.get_proxy()
 
         try:
             async with session.get(url, proxy=proxy) as response:
-                if response.status == 200:
-                    content = await response.text()
-                    if not self.content_deduplicator.is_duplicate(content):
-                        extracted_content = self.content_extractor.extract(content, url)
-                        if extracted_content:
-                            relevance_score = self.continuous_learner.predict(
-                                extracted_content["text"]
-                            )
-                            extracted_content["relevance_score"] = relevance_score
-                            extracted_content["url"] = url
-                            self.results.append(extracted_content)
-
-                            # Update the continuous learner
-                            self.continuous_learner.update(
-                                extracted_content["text"], int(relevance_score > 0.5)
-                            )
-
-                            # Extract and prioritize links
-                            soup = BeautifulSoup(content, "html.parser")
-                            links = [a["href"] for a in soup.find_all("a", href=True)]
-                            prioritized_links = self.link_prioritizer.prioritize_links(
-                                links
-                            )
-
-                            for link, priority in prioritized_links:
-                                full_url = (
-                                    urlparse(link).scheme
-                                    and link
-                                    or f"{urlparse(url).scheme}://{urlparse(url).netloc}{link}"
-                                )
-                                if full_url not in self.visited_urls:
-                                    self.url_queue.append((full_url, depth + 1))
-
-                    self.visited_urls.add(url)
-                    self.rate_limiter.update(domain, True)
-                else:
-                    self.logger.warning(
-                        f"Failed to fetch {url}: HTTP {response.status}"
-                    )
-                    self.rate_limiter.update(domain, False)
-
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+                content = await response.read() if status == 200 else None
+                encoding = response.get_encoding() if content is not None else None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Only transport errors say anything about the proxy
+            self.logger.error(f"Error fetching {url}: {str(e)}")
+            self.rate_limiter.update(domain, False)
+            self.proxy_manager.record(proxy, False)
+            return
         except Exception as e:
-            self.logger.error(f"Error processing {url}: {str(e)}")
+            self.logger.error(f"Error fetching {url}: {str(e)}")
             self.rate_limiter.update(domain, False)
+            return
+        # The proxy delivered a response, whatever its status
+        self.proxy_manager.record(proxy, True)
+
+        if status in (429, 503):
+            self.logger.warning(f"Throttled by {domain}: HTTP {status} for {url}")
+            # Sleep outside the request so the pooled connection is released
+            await self.rate_limiter.backoff(domain, retry_after)
+            await self._retry(url, depth)
+        elif status == 200:
+            try:
+                await self._process_page(url, depth, content, encoding)
+            except Exception as e:
+                self.logger.error(f"Error processing {url}: {str(e)}")
+                self.rate_limiter.update(domain, False)
+                return
+            self.visited_bloom.add(url)
+            self.visited_by_domain[domain].add(url)
+            self.retries.pop(url, None)
+            self.rate_limiter.update(domain, True)
+        else:
+            self.logger.warning(f"Failed to fetch {url}: HTTP {status}")
+            self.rate_limiter.update(domain, False)
+
+    async def _process_page(self, url: str, depth: int, content: bytes, encoding: str):
+        # Hash and parse the raw bytes; decode only once, for extraction
+        if self.content_deduplicator.is_exact_duplicate(content):
+            return
+        # Near-duplicates (shared templates, pagination) are not stored again, but
+        # their links still differ and are worth following
+        if not self.content_deduplicator.is_near_duplicate(content):
+            try:
+                html = content.decode(encoding, errors="replace")
+            except LookupError:
+                html = content.decode("utf-8", errors="replace")
+            extracted_content = self.content_extractor.extract(html, url)
+            if extracted_content:
+                relevance_score = self.continuous_learner.predict(
+                    extracted_content["text"]
+                )
+                extracted_content["relevance_score"] = float(relevance_score)
+                extracted_content["url"] = url
+                await self._write_result(extracted_content)
+
+                # Update the continuous learner
+                self.continuous_learner.update(
+                    extracted_content["text"], int(relevance_score > 0.5)
+                )
+
+        if depth >= self.max_depth:
+            return
+
+        # Extract and prioritize links
+        tree = HTMLParser(content)
+        anchors: List[Tuple[str, str]] = []
+        for node in tree.css("a[href]"):
+            href = node.attributes.get("href")
+            if not href:
+                continue
+            full_url = urljoin(url, href)
+            if full_url.startswith(("http://", "https://")):
+                anchors.append((full_url, node.text(strip=True)))
+        prioritized_links = self.link_prioritizer.prioritize_links(anchors)
+
+        # The frontier skips URLs it has already seen
+        for full_url, priority in prioritized_links:
+            await self._enqueue(full_url, depth + 1, priority)
+
+    async def _open_output(self, mode: str = "w"):
+        self._out = await aiofiles.open(self.output_file, mode, encoding="utf-8")
+
+    async def _close_output(self):
+        if self._out is not None:
+            await self._out.close()
+            self._out = None
+
+    async def _write_result(self, extracted_content: Dict):
+        if self._out is None:
+            # crawl() and crawl_frontier() can be awaited without start(); append
+            # rather than discard results, and open the file only once
+            async with self._out_lock:
+                if self._out is None:
+                    await self._open_output("a")
+        await self._out.write(orjson.dumps(extracted_content).decode() + "\n")
 
     async def start(self):
         start_time = time.time()
+        await self._open_output()
         with tqdm(total=len(self.seed_urls), desc="Crawling Progress") as pbar:
-            await self.crawl()
-            pbar.update(len(self.visited_urls))
+            try:
+                await self.crawl()
+            finally:
+                await self.close()
+            pbar.update(self.visited_count)
 
         self.logger.info(
-            f"Crawling completed. Total URLs crawled: {len(self.visited_urls)}"
+            f"Crawling completed. Total URLs crawled: {self.visited_count}"
         )
         self.logger.info(f"Total time: {time.time() - start_time:.2f} seconds")
-
-        # Store results in a file
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            json.dump(self.results, f, ensure_ascii=False, indent=2)
         self.logger.info(f"Results stored in {self.output_file}")
 
-    @celery_app.task
-    def crawl_url_task(url: str, depth: int, config: Dict) -> List[str]:
-        crawler = EnhancedCrawler([url], config, max_depth=1)
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(crawler.crawl())
-        return [result["url"] for result in crawler.results]
+    async def start_frontier(self):
+        # Append: a worker process may run several frontier tasks over its lifetime
+        await self._open_output("a")
+        try:
+            await self.crawl_frontier()
+        finally:
+            await self.close()
 
-    def run_distributed(self):
-        tasks = [
-            self.crawl_url_task.delay(url, 0, self.config) for url in self.seed_urls
-        ]
-        results = []
-
-        while tasks:
-            new_tasks = []
-            for task in tasks:
-                if task.ready():
-                    result = task.get()
-                    results.extend(result)
-                    if len(results) < self.max_depth * len(self.seed_urls):
-                        new_tasks.extend(
-                            [
-                                self.crawl_url_task.delay(
-                                    url, task.depth + 1, self.config
-                                )
-                                for url in result
-                            ]
-                        )
-                else:
-                    new_tasks.append(task)
-            tasks = new_tasks
-
-        return results
+    def run(self):
+        run_event_loop(self.start())
+
+    def run_distributed(self, num_workers: int = 4):
+        # Celery only triggers the workers; they coordinate through the Redis frontier.
+        # Each run gets its own keys under the configured prefix, or the seen filter
+        # left by an earlier run would reject every seed
+        config = {**self.config, "frontier_run_id": uuid.uuid4().hex}
+        run_event_loop(self.seed_frontier(config))
+        # The callback deletes the run's keys once every worker has finished
+        return chord(
+            crawl_frontier_task.s(
+                self.seed_urls,
+                config,
+                self.max_depth,
+                self.max_urls_per_domain,
+                self.output_file,
+            )
+            for _ in range(num_workers)
+        )(finish_frontier_task.s(config))
+
+
+@celery_app.task
+def crawl_frontier_task(
+    seed_urls: List[str],
+    config: Dict,
+    max_depth: int,
+    max_urls_per_domain: int,
+    output_file: str = "crawl_results.jsonl",
+) -> int:
+    if _worker_session is None:
+        init_worker_session()
+    # One output file per worker process so concurrent writers never interleave lines
+    root, ext = os.path.splitext(output_file)
+    crawler = EnhancedCrawler(
+        seed_urls,
+        config,
+        max_depth=max_depth,
+        max_urls_per_domain=max_urls_per_domain,
+        output_file=f"{root}.{os.getpid()}{ext}",
+        session=_worker_session,
+    )
+    _worker_loop.run_until_complete(crawler.start_frontier())
+    return crawler.visited_count
+
+
+@celery_app.task
+def finish_frontier_task(visited_counts: List[int], config: Dict) -> int:
+    if _worker_loop is None:
+        init_worker_session()
+
+    async def delete_frontier():
+        frontier = create_frontier(config)
+        try:
+            await frontier.delete()
+        finally:
+            await frontier.close()
 
+    _worker_loop.run_until_complete(delete_frontier())
+    return sum(visited_counts)
@@ -1,23 +1,94 @@
+import asyncio
+import math
+import random
 import time
 from collections import defaultdict
-from typing import Dict
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+
+class AsyncTokenBucket:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
 
 class AdaptiveRateLimiter:
-    def __init__(self, initial_delay: float = 1.0, backoff_factor: float = 1.5, max_delay: float = 60.0):
-        self.delays: Dict[str, float] = defaultdict(lambda: initial_delay)
-        self.last_request_time: Dict[str, float] = defaultdict(float)
+    def __init__(
+        self,
+        initial_delay: float = 1.0,
+        backoff_factor: float = 1.5,
+        max_delay: float = 60.0,
+        increase_factor: float = 1.05,
+        max_rate: float = 10.0,
+        min_rate: float = 0.1,
+    ):
+        self.buckets: Dict[str, AsyncTokenBucket] = defaultdict(
+            lambda: AsyncTokenBucket(rate=1.0 / initial_delay)
+        )
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.initial_delay = initial_delay
         self.backoff_factor = backoff_factor
         self.max_delay = max_delay
+        self.increase_factor = increase_factor
+        self.max_rate = max_rate
+        self.min_rate = min_rate
 
-    def wait(self, domain: str):
-        current_time = time.time()
-        elapsed = current_time - self.last_request_time[domain]
-        if elapsed < self.delays[domain]:
-            time.sleep(self.delays[domain] - elapsed)
-        self.last_request_time[domain] = time.time()
+    async def wait(self, domain: str):
+        await self.buckets[domain].acquire()
 
     def update(self, domain: str, success: bool):
+        bucket = self.buckets[domain]
         if success:
-            self.delays[domain] = max(self.delays[domain] / self.backoff_factor, 1.0)
+            # Hill-climb towards the highest rate the host tolerates
+            self.failures[domain] = 0
+            bucket.rate = min(bucket.rate * self.increase_factor, self.max_rate)
         else:
-            self.delays[domain] = min(self.delays[domain] * self.backoff_factor, self.max_delay)
\ No newline at end of file
+            self.failures[domain] += 1
+            bucket.rate = max(bucket.rate / self.backoff_factor, self.min_rate)
+
+    @staticmethod
+    def _parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+        if not retry_after:
+            return None
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            pass
+        else:
+            # float() also accepts "nan" and "inf", which would make sleep() hang
+            return max(delay, 0.0) if math.isfinite(delay) else None
+        try:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    async def backoff(self, domain: str, retry_after: Optional[str] = None):
+        """Back off a host that answered 429/503, honouring Retry-After when present."""
+        bucket = self.buckets[domain]
+        bucket.tokens = 0
+        bucket.updated = time.monotonic()
+        bucket.rate = max(bucket.rate * 0.5, self.min_rate)
+        self.failures[domain] += 1
+
+        delay = self._parse_retry_after(retry_after)
+        if delay is None:
+            delay = self.initial_delay * self.backoff_factor ** self.failures[domain]
+        delay = min(delay, self.max_delay)
+        await asyncio.sleep(delay + random.uniform(0, delay * 0.1))
@@ -1,13 +1,92 @@
 import hashlib
-from typing import Set
+import re
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from pybloom_live import ScalableBloomFilter
+from selectolax.parser import HTMLParser
+
+_DATE_RE = re.compile(
+    r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?\b"
+    r"|\b(?:mon|tue|wed|thu|fri|sat|sun)[a-z]*\.?\b"
+    r"|\b(?:am|pm)\b",
+    re.IGNORECASE,
+)
+_DIGITS_RE = re.compile(r"\d+")
+_TOKEN_RE = re.compile(r"\w+")
+
 
 class ContentDeduplicator:
-    def __init__(self):
-        self.content_hashes: Set[str] = set()
+    def __init__(
+        self,
+        initial_capacity: int = 1_000_000,
+        error_rate: float = 1e-4,
+        shingle_size: int = 4,
+        max_hamming_distance: int = 3,
+        recent_fingerprints: int = 1_000,
+    ):
+        # Exact duplicates: BLAKE2b-128 digests of the raw content
+        self.bloom = ScalableBloomFilter(initial_capacity=initial_capacity, error_rate=error_rate)
+        # Near duplicates: top 48 bits of the SimHash of the normalized text
+        self.simhash_bloom = ScalableBloomFilter(initial_capacity=initial_capacity, error_rate=error_rate)
+        self.recent_fingerprints: "OrderedDict[int, None]" = OrderedDict()
+        self.shingle_size = shingle_size
+        self.max_hamming_distance = max_hamming_distance
+        self.max_recent_fingerprints = recent_fingerprints
+
+    @staticmethod
+    def _normalize(content: bytes) -> List[str]:
+        body = HTMLParser(content).body
+        text = body.text(separator=" ") if body is not None else ""
+        text = _DATE_RE.sub(" ", text)
+        text = _DIGITS_RE.sub(" ", text)
+        return _TOKEN_RE.findall(text.lower())
+
+    def _simhash(self, content: bytes) -> int:
+        tokens = self._normalize(content)
+        if len(tokens) < self.shingle_size:
+            shingles = [" ".join(tokens)] if tokens else []
+        else:
+            shingles = [
+                " ".join(tokens[i:i + self.shingle_size])
+                for i in range(len(tokens) - self.shingle_size + 1)
+            ]
+        if not shingles:
+            return 0
+
+        # One 64-bit hash per shingle, unpacked to a (shingles, 64) bit matrix; each
+        # fingerprint bit is set where the shingles' +1/-1 votes come out positive
+        digests = b"".join(
+            hashlib.blake2b(shingle.encode(), digest_size=8).digest() for shingle in shingles
+        )
+        bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+        votes = 2 * bits.sum(axis=0, dtype=np.int64) - len(shingles)
+        return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
 
-    def is_duplicate(self, content: str) -> bool:
-        content_hash = hashlib.md5(content.encode()).hexdigest()
-        if content_hash in self.content_hashes:
+    def _is_near_duplicate(self, fingerprint: int) -> bool:
+        if self.simhash_bloom.add(fingerprint >> 16):
             return True
-        self.content_hashes.add(content_hash)
-        return False
\ No newline at end of file
+
+        for recent in self.recent_fingerprints:
+            if bin(fingerprint ^ recent).count("1") <= self.max_hamming_distance:
+                self.recent_fingerprints.move_to_end(recent)
+                return True
+
+        self.recent_fingerprints[fingerprint] = None
+        if len(self.recent_fingerprints) > self.max_recent_fingerprints:
+            self.recent_fingerprints.popitem(last=False)
+        return False
+
+    def is_exact_duplicate(self, content: bytes) -> bool:
+        content_hash = hashlib.blake2b(content, digest_size=16).digest()
+        return self.bloom.add(content_hash)
+
+    def is_near_duplicate(self, content: bytes) -> bool:
+        fingerprint = self._simhash(content)
+        if not fingerprint:
+            return False
+        return self._is_near_duplicate(fingerprint)
+
+    def is_duplicate(self, content: bytes) -> bool:
+        return self.is_exact_duplicate(content) or self.is_near_duplicate(content)
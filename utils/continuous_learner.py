@@ -1,27 +1,25 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
 from typing import List
 
 class ContinuousLearner:
+    classes = np.array([0, 1])
+
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(max_features=1000)
-        self.classifier = MultinomialNB()
-        self.is_trained = False
+        # Stateless hashing keeps the feature space fixed, so every update is a true partial_fit
+        self.vectorizer = HashingVectorizer(n_features=2**18, alternate_sign=False, norm="l2")
+        self.classifier = SGDClassifier(loss="log_loss", learning_rate="optimal")
+        # Warm up on empty documents of both classes so predict() works before any real update
+        self.train(["", ""], [0, 1])
 
     def train(self, texts: List[str], labels: List[int]):
-        X = self.vectorizer.fit_transform(texts)
-        self.classifier.fit(X, labels)
-        self.is_trained = True
+        X = self.vectorizer.transform(texts)
+        self.classifier.partial_fit(X, labels, classes=self.classes)
 
     def predict(self, text: str) -> float:
-        if not self.is_trained:
-            return 0.5
         X = self.vectorizer.transform([text])
         return self.classifier.predict_proba(X)[0][1]
 
     def update(self, text: str, label: int):
-        if not self.is_trained:
-            self.train([text], [label])
-        else:
-            X = self.vectorizer.transform([text])
-            self.classifier.partial_fit(X, [label])
\ No newline at end of file
+        self.train([text], [label])
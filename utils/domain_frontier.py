@@ -0,0 +1,92 @@
+import asyncio
+import heapq
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+from urllib.parse import urlparse
+
+from pybloom_live import ScalableBloomFilter
+
+
+class DomainFrontier:
+    """Queue of (url, depth) holding one priority heap per domain.
+
+    get() serves domains round-robin, taking the highest-priority URL of each in
+    turn, so a single high-priority domain cannot starve the others. URLs already
+    pushed once are skipped. get(), task_done() and join() behave like asyncio.Queue.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        # Round-robin order of the domains that still have pending URLs
+        self._domains: Deque[str] = deque()
+        self._heaps: Dict[str, List[Tuple[float, int, str, int]]] = {}
+        self._size = 0
+        self._counter = 0
+        self._not_empty = asyncio.Event()
+        self._unfinished_tasks = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self.seen = ScalableBloomFilter(initial_capacity=100_000, error_rate=1e-4)
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self._size
+
+    def _put(self, url: str, depth: int, priority: float):
+        domain = urlparse(url).netloc
+        heap = self._heaps.get(domain)
+        if heap is None:
+            heap = self._heaps[domain] = []
+            self._domains.append(domain)
+        # The counter keeps equal priorities in FIFO order
+        heapq.heappush(heap, (-priority, self._counter, url, depth))
+        self._counter += 1
+        self._size += 1
+        self._unfinished_tasks += 1
+        self._finished.clear()
+        self._not_empty.set()
+
+    def push(self, url: str, depth: int, priority: float) -> bool:
+        """Enqueue a URL without waiting; returns False if it was seen before or the frontier is full."""
+        if url in self.seen or self.full():
+            return False
+        self.seen.add(url)
+        self._put(url, depth, priority)
+        return True
+
+    def requeue(self, url: str, depth: int, priority: float):
+        """Enqueue a URL again, bypassing the seen filter and the size limit."""
+        self._put(url, depth, priority)
+
+    async def get(self) -> Tuple[str, int]:
+        """Remove and return the next (url, depth), waiting until one is available."""
+        # Every waiting getter wakes on the event and re-checks, so one that is
+        # cancelled after waking never swallows an item
+        while self._size == 0:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        domain = self._domains.popleft()
+        heap = self._heaps[domain]
+        _, _, url, depth = heapq.heappop(heap)
+        if heap:
+            self._domains.append(domain)
+        else:
+            del self._heaps[domain]
+        self._size -= 1
+        return url, depth
+
+    def task_done(self):
+        if self._unfinished_tasks <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished_tasks -= 1
+        if self._unfinished_tasks == 0:
+            self._finished.set()
+
+    async def join(self):
+        """Wait until every pushed URL has been taken with get() and marked task_done()."""
+        await self._finished.wait()
@@ -1,13 +1,74 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
-from collections import Counter
-from typing import Dict, List, Tuple
-import torch
-from transformers import AutoTokenizer, AutoModel
+import re
+import hashlib
+import ahocorasick
+from selectolax.parser import HTMLParser
+from urllib.parse import urlsplit
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# SentenceTransformer's ONNX backend needs both; without them it runs FP32 PyTorch
+try:
+    import onnxruntime
+    import optimum.onnxruntime  # noqa: F401
+except ImportError:
+    onnxruntime = None
+
+# Sentence-transformers Hub models ship this dynamically quantized INT8 export
+DEFAULT_ONNX_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+# A keyword only counts when the characters on either side of it are not word
+# characters; non-ASCII UTF-8 bytes are treated as word characters
+_WORD_CHAR_RE = re.compile(r"\w")
+_WORD_BYTE_RE = re.compile(rb"[\w\x80-\xff]")
+
+
+def _is_whole_word(text, start: int, end: int, word_re: "re.Pattern") -> bool:
+    return not (start > 0 and word_re.match(text, start - 1)) and not word_re.match(text, end)
+
+
+def _text_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+class _LRUCache:
+    """In-memory LRU cache, optionally backed by a persistent diskcache.Cache."""
+
+    def __init__(self, name: str, maxsize: int, disk_cache: Optional[Any] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.disk_cache = disk_cache
+        self.entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def _store(self, key: Hashable, value: Any):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.disk_cache is not None:
+            value = self.disk_cache.get((self.name, key))
+            if value is not None:
+                self._store(key, value)
+            return value
+        return None
+
+    def set(self, key: Hashable, value: Any):
+        self._store(key, value)
+        if self.disk_cache is not None:
+            self.disk_cache.set((self.name, key), value)
+
+
 class EnhancedLinkPrioritizer:
     def __init__(
         self,
@@ -15,81 +76,157 @@ class EnhancedLinkPrioritizer:
         keyword_weights: Dict[str, int],
         content_type_weights: Dict[str, int],
         target_keywords: List[str],
-        model_name: str = "distilbert-base-uncased",
-        sentence_model_name: str = "paraphrase-MiniLM-L6-v2"
+        sentence_model_name: str = "paraphrase-MiniLM-L6-v2",
+        batch_size: int = 64,
+        cache_size: int = 50_000,
+        cache_dir: Optional[str] = None,
+        hyperscan_min_keywords: int = 1000,
+        onnx_file_name: Optional[str] = DEFAULT_ONNX_FILE
     ):
         self.priority_rules = priority_rules
         self.keyword_weights = keyword_weights
         self.content_type_weights = content_type_weights
         self.target_keywords = target_keywords
         self.visited_domains: Counter[str] = Counter()
+        self.batch_size = batch_size
+
+        # Cache embeddings by text digest; URLs and anchors repeat heavily across pages
+        disk_cache = None
+        if cache_dir is not None:
+            import diskcache
+            disk_cache = diskcache.Cache(cache_dir)
+
+        # Run the sentence model as an INT8 ONNX graph when ONNX Runtime is installed.
+        # Models without a quantized file can be exported once, offline, with
+        # sentence_transformers.export_dynamic_quantized_onnx_model
+        if onnx_file_name is not None and onnxruntime is not None:
+            self.sentence_transformer = SentenceTransformer(
+                sentence_model_name,
+                backend="onnx",
+                model_kwargs={"file_name": onnx_file_name, "provider": "CPUExecutionProvider"},
+            )
+            model_id = f"{sentence_model_name}:{onnx_file_name}"
+        else:
+            self.sentence_transformer = SentenceTransformer(sentence_model_name)
+            model_id = sentence_model_name
+        # Quantized and FP32 embeddings differ slightly, so they are cached apart
+        self.embedding_cache = _LRUCache(f"embedding:{model_id}", cache_size, disk_cache)
+
+        # Match every keyword in a single pass over the text
+        self.keyword_automaton = ahocorasick.Automaton()
+        for keyword, weight in keyword_weights.items():
+            self.keyword_automaton.add_word(keyword.lower(), (keyword.lower(), weight))
+        if keyword_weights:
+            self.keyword_automaton.make_automaton()
+
+        # Content types are matched against URL paths in one pass as well
+        self.content_type_automaton = ahocorasick.Automaton()
+        for content_type, weight in content_type_weights.items():
+            self.content_type_automaton.add_word(content_type, (content_type, weight))
+        if content_type_weights:
+            self.content_type_automaton.make_automaton()
+
+        # Very large keyword sets scan faster as a single Hyperscan DFA when it is available
+        self.keyword_ids_weights = list(keyword_weights.values())
+        self.keyword_ids_lengths = [len(keyword.lower().encode()) for keyword in keyword_weights]
+        self.hyperscan_db = None
+        if hyperscan is not None and len(keyword_weights) >= hyperscan_min_keywords:
+            self.hyperscan_db = hyperscan.Database()
+            self.hyperscan_db.compile(
+                expressions=[re.escape(keyword.lower()).encode() for keyword in keyword_weights],
+                ids=list(range(len(keyword_weights))),
+                elements=len(keyword_weights),
+                flags=[hyperscan.HS_FLAG_CASELESS] * len(keyword_weights),
+            )
         
-        # Initialize BERT model and tokenizer
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModel.from_pretrained(model_name)
-        
-        # Initialize Sentence Transformer
-        self.sentence_transformer = SentenceTransformer(sentence_model_name)
-        
-        # Encode target keywords
-        self.target_embedding = self.sentence_transformer.encode(" ".join(target_keywords))
-
-    def fetch_webpage_content(self, url: str) -> str:
-        """Fetch the content of a webpage and return it as a string."""
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response.text
-        except requests.RequestException:
-            return ""
+        # Encode target keywords, normalized once so cosine similarity is a dot product
+        self.target_embedding = self.sentence_transformer.encode(
+            " ".join(target_keywords), convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32, copy=False)
 
     def extract_text_from_html(self, html: str) -> str:
         """Extract text content from HTML."""
-        soup = BeautifulSoup(html, "html.parser")
-        return soup.get_text(separator=" ", strip=True)
-
-    def calculate_semantic_similarity(self, text: str) -> float:
-        """Calculate semantic similarity between the text and target keywords."""
-        text_embedding = self.sentence_transformer.encode(text)
-        return np.dot(text_embedding, self.target_embedding) / (np.linalg.norm(text_embedding) * np.linalg.norm(self.target_embedding))
-
-    def extract_keywords(self, text: str) -> List[str]:
-        """Extract important keywords from the text using BERT."""
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        
-        # Get the attention weights from the last layer
-        attention = outputs.attentions[-1].mean(dim=1).mean(dim=1)
-        
-        # Get the tokens with the highest attention
-        _, top_indices = attention.topk(10)
-        
-        # Convert token IDs back to words
-        keywords = [self.tokenizer.decode([token_id]) for token_id in inputs.input_ids[0][top_indices]]
-        return [kw.strip() for kw in keywords if kw.strip()]
+        body = HTMLParser(html).body
+        return body.text(separator=" ", strip=True) if body is not None else ""
 
-    def calculate_priority(self, url: str, content: str) -> float:
-        """Calculate the priority of a URL based on deep learning analysis."""
-        domain = urlparse(url).netloc
-        base_priority = float(self.priority_rules.get(domain, 0))
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Return normalized embeddings, batch-encoding only the texts missing from the cache."""
+        hashes = [_text_hash(text) for text in texts]
+        embeddings = [self.embedding_cache.get(text_hash) for text_hash in hashes]
 
-        text = self.extract_text_from_html(content)
-        
-        # Semantic similarity
-        semantic_similarity = self.calculate_semantic_similarity(text)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.sentence_transformer.encode(
+                [texts[i] for i in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+            for i, embedding in zip(missing, encoded):
+                # Copy so a cached row does not keep the whole batch matrix alive
+                embedding = embedding.copy()
+                self.embedding_cache.set(hashes[i], embedding)
+                embeddings[i] = embedding
+        return np.stack(embeddings)
+
+    def calculate_semantic_similarity(self, texts: List[str]) -> np.ndarray:
+        """Calculate cosine similarity between each text and the target keywords as one matvec."""
+        if not texts:
+            return np.empty(0, dtype=np.float32)
+        # Both sides are unit vectors, so the dot product is the cosine similarity
+        return self._embed(texts) @ self.target_embedding
+
+    def calculate_keyword_score(self, text: str) -> float:
+        """Sum the weights of all whole-word keyword occurrences in the text."""
+        if not self.keyword_weights:
+            return 0.0
+        text = text.lower()
+        if self.hyperscan_db is not None:
+            data = text.encode()
+            score = 0.0
+
+            def on_match(keyword_id, start, end, flags, context):
+                nonlocal score
+                # Without SOM tracking Hyperscan only reports the end offset
+                start = end - self.keyword_ids_lengths[keyword_id]
+                if _is_whole_word(data, start, end, _WORD_BYTE_RE):
+                    score += self.keyword_ids_weights[keyword_id]
+
+            self.hyperscan_db.scan(data, match_event_handler=on_match)
+            return score
+        return float(sum(
+            weight
+            for end, (keyword, weight) in self.keyword_automaton.iter(text)
+            if _is_whole_word(text, end - len(keyword) + 1, end + 1, _WORD_CHAR_RE)
+        ))
+
+    def _url_features(self, url: str) -> Tuple[str, float]:
+        """Return the URL's domain and the part of its priority that depends only on the URL."""
+        parts = urlsplit(url)
+        score = float(self.priority_rules.get(parts.netloc, 0))
+
+        # Content type weighting; each content type counts once however often it matches
+        if self.content_type_weights:
+            matched = {
+                content_type: weight
+                for _, (content_type, weight) in self.content_type_automaton.iter(parts.path)
+            }
+            score += sum(matched.values())
+
+        # URL depth penalty
+        score -= url.count("/") * 0.5
+        return parts.netloc, score
+
+    def _score(self, domain: str, url_score: float, anchor_text: str, semantic_similarity: float) -> float:
+        """Combine the URL-only score with anchor-text and domain-diversity signals."""
+        base_priority = url_score
+
+        # Semantic similarity of the anchor text, precomputed for the whole batch of links
         base_priority += semantic_similarity * 10
         
-        # Keyword extraction and matching
-        extracted_keywords = self.extract_keywords(text)
-        keyword_score = sum(self.keyword_weights.get(kw, 0) for kw in extracted_keywords)
-        base_priority += keyword_score
-        
-        # Content type weighting
-        path = urlparse(url).path
-        for content_type, weight in self.content_type_weights.items():
-            if content_type in path:
-                base_priority += weight
+        # Keyword matching on the anchor text
+        base_priority += self.calculate_keyword_score(anchor_text)
         
         # Domain diversity
         if self.visited_domains[domain] == 0:
@@ -97,20 +234,22 @@ class EnhancedLinkPrioritizer:
         elif self.visited_domains[domain] < 5:
             base_priority += 1
         
-        # URL depth penalty
-        depth = url.count("/")
-        base_priority -= depth * 0.5
-        
         return max(base_priority, 0)
 
-    def prioritize_links(self, links: List[str]) -> List[Tuple[str, float]]:
-        """Prioritize a list of links based on their calculated priority."""
+    def calculate_priority(self, url: str, anchor_text: str, semantic_similarity: float) -> float:
+        """Calculate the priority of a URL from its URL features and anchor text."""
+        domain, url_score = self._url_features(url)
+        return self._score(domain, url_score, anchor_text, semantic_similarity)
+
+    def prioritize_links(self, anchors: List[Tuple[str, str]]) -> List[Tuple[str, float]]:
+        """Prioritize (href, anchor text) pairs harvested from an already-downloaded page."""
+        texts = [anchor_text or link for link, anchor_text in anchors]
+        similarities = self.calculate_semantic_similarity(texts)
+
         prioritized_links: List[Tuple[str, float]] = []
-        for link in links:
-            content = self.fetch_webpage_content(link)
-            if not content:
-                continue
-            priority = self.calculate_priority(link, content)
+        for (link, anchor_text), similarity in zip(anchors, similarities):
+            domain, url_score = self._url_features(link)
+            priority = self._score(domain, url_score, anchor_text, float(similarity))
             prioritized_links.append((link, priority))
-            self.visited_domains[urlparse(link).netloc] += 1
+            self.visited_domains[domain] += 1
         return sorted(prioritized_links, key=lambda x: x[1], reverse=True)
@@ -1,14 +1,31 @@
-from typing import List, Dict
+import asyncio
+import logging
+import random
+from typing import List, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 class ProxyManager:
     def __init__(self, proxies: List[str]):
         self.proxies = proxies
-        self.current_index = 0
+        # proxy -> (successes, failures)
+        self.stats: Dict[str, Tuple[int, int]] = {proxy: (0, 0) for proxy in proxies}
+
+    def get_proxy(self) -> Optional[str]:
+        if not self.proxies:
+            return None
+        # Laplace-smoothed success rate, so untried proxies still get picked
+        weights = [
+            (successes + 1) / (successes + failures + 2)
+            for successes, failures in (self.stats.get(proxy, (0, 0)) for proxy in self.proxies)
+        ]
+        return random.choices(self.proxies, weights=weights, k=1)[0]
 
-    def get_proxy(self) -> Dict[str, str]:
-        proxy = self.proxies[self.current_index]
-        self.current_index = (self.current_index + 1) % len(self.proxies)
-        return {"http": proxy, "https": proxy}
+    def record(self, proxy: Optional[str], success: bool):
+        if proxy is None:
+            return
+        successes, failures = self.stats.get(proxy, (0, 0))
+        self.stats[proxy] = (successes + 1, failures) if success else (successes, failures + 1)
 
     @staticmethod
     async def check_proxy(session, proxy: str) -> bool:
@@ -19,8 +36,17 @@ class ProxyManager:
             return False
 
     async def update_proxies(self, session) -> None:
-        valid_proxies = []
-        for proxy in self.proxies:
-            if await self.check_proxy(session, proxy):
-                valid_proxies.append(proxy)
-        self.proxies = valid_proxies
\ No newline at end of file
+        results = await asyncio.gather(
+            *(self.check_proxy(session, proxy) for proxy in self.proxies), return_exceptions=True
+        )
+        for proxy, ok in zip(self.proxies, results):
+            self.record(proxy, ok is True)
+        working = [proxy for proxy, ok in zip(self.proxies, results) if ok is True]
+        if self.proxies and not working:
+            # More likely the check endpoint is unreachable than every proxy dead;
+            # emptying the list would silently send all traffic from the host's own IP
+            logger.warning(
+                f"All {len(self.proxies)} proxies failed the health check; keeping them"
+            )
+            return
+        self.proxies = working
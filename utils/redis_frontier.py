@@ -0,0 +1,77 @@
+import redis.asyncio as aioredis
+from redis.exceptions import ResponseError
+from typing import Optional, Tuple
+
+
+class RedisFrontier:
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379",
+        prefix: str = "crawler",
+        capacity: int = 1_000_000,
+        error_rate: float = 1e-4,
+        expansion: int = 2,
+        ttl: int = 86_400,
+    ):
+        self.redis = aioredis.Redis.from_url(redis_url, decode_responses=True)
+        self.frontier_key = f"{prefix}:frontier"
+        self.seen_key = f"{prefix}:seen"
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.expansion = expansion
+        self.ttl = ttl
+        self._reserved = False
+
+    async def _reserve(self):
+        if self._reserved:
+            return
+        try:
+            # Start small and let the filter grow by stacking sub-filters as needed
+            await self.redis.execute_command(
+                "BF.RESERVE", self.seen_key, self.error_rate, self.capacity,
+                "EXPANSION", self.expansion,
+            )
+        except ResponseError:
+            # Another worker already created the filter
+            pass
+        self._reserved = True
+
+    async def _add(self, url: str, depth: int, priority: float):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            # Lowest score pops first, so store the negated priority
+            pipe.zadd(self.frontier_key, {f"{depth} {url}": -priority})
+            # Keys of a run whose cleanup never ran expire once it goes quiet
+            pipe.expire(self.frontier_key, self.ttl)
+            pipe.expire(self.seen_key, self.ttl)
+            await pipe.execute()
+
+    async def push(self, url: str, depth: int, priority: float) -> bool:
+        """Enqueue a URL unless the seen-URL Bloom filter says it was already enqueued."""
+        await self._reserve()
+        if not await self.redis.execute_command("BF.ADD", self.seen_key, url):
+            return False
+        await self._add(url, depth, priority)
+        return True
+
+    async def requeue(self, url: str, depth: int, priority: float):
+        """Enqueue a URL again, bypassing the seen-URL Bloom filter."""
+        await self._add(url, depth, priority)
+
+    async def pop(self, timeout: float = 1.0) -> Optional[Tuple[str, int]]:
+        """Dequeue the highest-priority URL and its depth, blocking up to `timeout` seconds.
+
+        Returns None if the frontier stayed empty for the whole timeout.
+        """
+        popped = await self.redis.bzpopmin(self.frontier_key, timeout=timeout)
+        if not popped:
+            return None
+        _, member, _ = popped
+        depth, url = member.split(" ", 1)
+        return url, int(depth)
+
+    async def delete(self):
+        """Remove the frontier and its seen-URL filter from Redis."""
+        await self.redis.delete(self.frontier_key, self.seen_key)
+
+    async def close(self):
+        await self.redis.aclose()
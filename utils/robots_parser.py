@@ -1,15 +1,74 @@
+import asyncio
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Tuple
 from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
 
+import aiohttp
+
 class RobotsParser:
-    def __init__(self):
-        self.parsers = {}
-
-    def can_fetch(self, url: str, user_agent: str) -> bool:
-        domain = urlparse(url).netloc
-        if domain not in self.parsers:
-            robots_url = f"https://{domain}/robots.txt"
-            parser = RobotFileParser(robots_url)
-            parser.read()
-            self.parsers[domain] = parser
-        return self.parsers[domain].can_fetch(user_agent, url)
\ No newline at end of file
+    def __init__(
+        self,
+        ttl: float = 3600.0,
+        max_entries: int = 10_000,
+        timeout: float = 5.0,
+        failure_ttl: float = 60.0,
+    ):
+        # domain -> (expiry time, parser)
+        self.parsers: "OrderedDict[str, Tuple[float, RobotFileParser]]" = OrderedDict()
+        self.locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+
+    async def _fetch_parser(
+        self, session: aiohttp.ClientSession, scheme: str, domain: str
+    ) -> Tuple[RobotFileParser, float]:
+        """Fetch and parse robots.txt; returns the parser and how long to cache it."""
+        parser = RobotFileParser(f"{scheme}://{domain}/robots.txt")
+        try:
+            async with session.get(parser.url, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                # Same status handling as RobotFileParser.read()
+                if response.status in (401, 403):
+                    parser.disallow_all = True
+                elif 400 <= response.status < 500:
+                    parser.allow_all = True
+                elif response.status >= 500:
+                    parser.disallow_all = True
+                    # Server errors are often transient; retry soon instead of
+                    # banning the domain for the full TTL
+                    return parser, self.failure_ttl
+                else:
+                    parser.parse((await response.text(errors="replace")).splitlines())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            # Unreachable robots.txt: stay polite, but only until a quick retry
+            parser.disallow_all = True
+            return parser, self.failure_ttl
+        return parser, self.ttl
+
+    async def _get_parser(self, session: aiohttp.ClientSession, scheme: str, domain: str) -> RobotFileParser:
+        entry = self.parsers.get(domain)
+        if entry is not None and time.time() < entry[0]:
+            self.parsers.move_to_end(domain)
+            return entry[1]
+
+        # One fetch per domain even when many workers reach it at once
+        async with self.locks[domain]:
+            entry = self.parsers.get(domain)
+            if entry is not None and time.time() < entry[0]:
+                return entry[1]
+
+            parser, ttl = await self._fetch_parser(session, scheme, domain)
+            self.parsers[domain] = (time.time() + ttl, parser)
+            self.parsers.move_to_end(domain)
+            while len(self.parsers) > self.max_entries:
+                evicted, _ = self.parsers.popitem(last=False)
+                self.locks.pop(evicted, None)
+            return parser
+
+    async def can_fetch(self, session: aiohttp.ClientSession, url: str, user_agent: str) -> bool:
+        parsed = urlparse(url)
+        parser = await self._get_parser(session, parsed.scheme or "https", parsed.netloc)
+        return parser.can_fetch(user_agent, url)
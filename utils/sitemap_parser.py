@@ -1,15 +1,15 @@
-import requests
+import aiohttp
 from typing import List, Optional
 from xml.etree import ElementTree as ET
 
 class SitemapParser:
     @staticmethod
-    def parse(url: str) -> Optional[List[str]]:
+    async def parse(session: aiohttp.ClientSession, url: str, timeout: float = 15) -> Optional[List[str]]:
         try:
-            response = requests.get(url)
-            root = ET.fromstring(response.content)
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                root = ET.fromstring(await response.read())
             namespace = {'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
             return [loc.text for loc in root.findall('.//sm:loc', namespace) if loc.text]
         except Exception as e:
             print(f"Error parsing sitemap {url}: {str(e)}")
-            return None
\ No newline at end of file
+            return None